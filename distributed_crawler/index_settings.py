@@ -0,0 +1,56 @@
+# index_settings.py
+
+import time
+
+# Elasticsearch index shared by the indexer API, crawl workers and reindex
+INDEX_NAME = 'web_pages'
+
+# stemming analyzer
+INDEX_SETTINGS = {
+    'settings': {
+        'analysis': {
+            'analyzer': {
+                'default': {
+                    'type': 'standard',
+                    'stopwords': '_english_',
+                    'filter': ['lowercase', 'porter_stem']
+                }
+            }
+        }
+    },
+    'mappings': {
+        'properties': {
+            'text': {'type': 'text'}
+        }
+    }
+}
+
+def ensure_index(es):
+    """Create the index with INDEX_SETTINGS if it doesn't exist yet."""
+    es.indices.create(index=INDEX_NAME, body=INDEX_SETTINGS, ignore=400)
+
+def create_versioned_index(es):
+    """
+    Create a fresh web_pages_<timestamp> index with INDEX_SETTINGS for a
+    rebuild; searches keep hitting the live index until switch_alias.
+    """
+    name = f"{INDEX_NAME}_{time.strftime('%Y%m%d%H%M%S')}"
+    es.indices.create(index=name, body=INDEX_SETTINGS)
+    return name
+
+def switch_alias(es, target):
+    """
+    Atomically point the INDEX_NAME alias at target, replacing either the
+    indices it pointed to before or a plain INDEX_NAME index, then drop the
+    replaced indices.
+    """
+    actions = [{'add': {'index': target, 'alias': INDEX_NAME}}]
+    old = []
+    if es.indices.exists_alias(name=INDEX_NAME):
+        old = [i for i in es.indices.get_alias(name=INDEX_NAME) if i != target]
+        actions += [{'remove': {'index': i, 'alias': INDEX_NAME}} for i in old]
+    elif es.indices.exists(index=INDEX_NAME):
+        actions.append({'remove_index': {'index': INDEX_NAME}})
+    es.indices.update_aliases(actions=actions)
+    for i in old:
+        es.indices.delete(index=i, ignore=404)
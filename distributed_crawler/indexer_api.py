@@ -1,30 +1,26 @@
 # indexer_api.py
+import threading
 from flask import Flask, request, jsonify
 from elasticsearch import Elasticsearch, NotFoundError
+from index_settings import INDEX_NAME, ensure_index
 
 app = Flask(__name__)
-es = Elasticsearch([{'host': '10.128.0.5', 'port': 9200, 'scheme': 'http'}])
+ES_HOSTS = [{'host': '10.128.0.5', 'port': 9200, 'scheme': 'http'}]
+_es = None
+_es_lock = threading.Lock()
 
-# ensure index with stemming analyzer
-settings = {
-    'settings': {
-        'analysis': {
-            'analyzer': {
-                'default': {
-                    'type': 'standard',
-                    'stopwords': '_english_',
-                    'filter': ['lowercase', 'porter_stem']
-                }
-            }
-        }
-    },
-    'mappings': {
-        'properties': {
-            'text': {'type': 'text'}
-        }
-    }
-}
-es.indices.create(index='web_pages', body=settings, ignore=400)
+def get_es():
+    """
+    Return the Elasticsearch client, creating it and ensuring the index
+    exists on first use rather than at import time.
+    """
+    global _es
+    with _es_lock:
+        if _es is None:
+            es = Elasticsearch(ES_HOSTS)
+            ensure_index(es)
+            _es = es
+        return _es
 
 @app.route('/api/search')
 def search():
@@ -34,14 +30,14 @@ def search():
     if mode == 'phrase':
         body = {'query': {'match_phrase': {'text': q}}}
     try:
-        res = es.search(index='web_pages', body=body)
+        res = get_es().search(index=INDEX_NAME, body=body)
     except NotFoundError:
         return jsonify([]), 404
     return jsonify([hit['_source'] for hit in res['hits']['hits']])
 
 @app.route('/api/metrics')
 def metrics():
-    total = es.count(index='web_pages')['count']
+    total = get_es().count(index=INDEX_NAME)['count']
     return jsonify({'indexed_pages': total})
 
 if __name__ == '__main__':
@@ -1,21 +1,23 @@
 #!/usr/bin/env python3
 
 import argparse
+import hashlib
+import itertools
+import sys
 import time
 import threading
-from celery import Celery
-from pymongo import MongoClient
-from elasticsearch import Elasticsearch, NotFoundError
+
+from index_settings import (INDEX_NAME, create_versioned_index, ensure_index,
+                            switch_alias)
+
+# Celery, pymongo and elasticsearch are imported on first use so that
+# `--help` and simple subcommands don't pay for clients they never touch.
 
 # -------------------
 # Celery config
 # -------------------
-app = Celery(
-    'master',
-    broker='redis://10.128.0.2:6379/0',
-    backend='redis://10.128.0.2:6379/1'
-)
-app.conf.update(task_track_started=True)
+BROKER_URL  = 'redis://10.128.0.2:6379/0'
+BACKEND_URL = 'redis://10.128.0.2:6379/1'
 
 # -------------------
 # MongoDB (Atlas) connection
@@ -25,20 +27,52 @@ MONGO_URI = (
     "@cluster0.e6mv0ek.mongodb.net/?retryWrites=true"
     "&w=majority&appName=Cluster0"
 )
-mongo = MongoClient(MONGO_URI, tls=True, tlsAllowInvalidCertificates=True)
-db = mongo['Crawler']
 
 # -------------------
 # Elasticsearch (Indexer node)
 # -------------------
-es = Elasticsearch([
-    {'host': '10.128.0.5', 'port': 9200, 'scheme': 'http'}
-])
+ES_HOSTS = [{'host': '10.128.0.5', 'port': 9200, 'scheme': 'http'}]
+
+# -------------------
+# Lazily created clients
+# -------------------
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_app():
+    """Return the Celery app, creating it on first use."""
+    with _clients_lock:
+        if 'app' not in _clients:
+            from celery import Celery
+            app = Celery('master', broker=BROKER_URL, backend=BACKEND_URL)
+            app.conf.update(task_track_started=True)
+            _clients['app'] = app
+        return _clients['app']
+
+def get_db():
+    """Return the Crawler database, connecting on first use."""
+    with _clients_lock:
+        if 'mongo' not in _clients:
+            from pymongo import MongoClient
+            _clients['mongo'] = MongoClient(MONGO_URI, tls=True,
+                                            tlsAllowInvalidCertificates=True)
+        return _clients['mongo']['Crawler']
+
+def get_es():
+    """Return the Elasticsearch client, creating it on first use."""
+    with _clients_lock:
+        if 'es' not in _clients:
+            from elasticsearch import Elasticsearch
+            _clients['es'] = Elasticsearch(ES_HOSTS)
+        return _clients['es']
 
 # -------------------
 # Heartbeat Monitor (optional background)
 # -------------------
 def heartbeat_monitor(interval=10):
+    app = get_app()
+    db  = get_db()
+    es  = get_es()
     while True:
         now = time.time()
         try:
@@ -79,6 +113,7 @@ def heartbeat_monitor(interval=10):
 # Task Timeout & Re-queue Monitor
 # -------------------
 def monitor_tasks(interval=300):
+    db = get_db()
     from tasks import crawl_url
     while True:
         now = time.time()
@@ -107,6 +142,7 @@ def monitor_tasks(interval=300):
 # CLI commands
 # -------------------
 def enqueue_crawl(url, depth, politeness):
+    db = get_db()
     from tasks import crawl_url
     result = crawl_url.delay(url, depth, politeness)
     db.task_status.insert_one({
@@ -123,6 +159,9 @@ def enqueue_crawl(url, depth, politeness):
     print(f"[✔] Task queued: {url} (id={result.id})")
 
 def do_search(keywords, mode, size):
+    from elasticsearch import NotFoundError
+    db = get_db()
+    es = get_es()
     if mode == 'phrase':
         q = {"query": {"match_phrase": {"text": keywords}}}
     elif mode == 'boolean':
@@ -131,7 +170,7 @@ def do_search(keywords, mode, size):
         q = {"query": {"match": {"text": keywords}}}
 
     try:
-        resp = es.search(index="web_pages", body=q, size=size)
+        resp = es.search(index=INDEX_NAME, body=q, size=size)
     except NotFoundError:
         print("Index not found. Have you run any crawls yet?")
         return
@@ -150,10 +189,13 @@ def do_search(keywords, mode, size):
         print(" •", h['_source']['url'])
 
 def show_status():
+    app = get_app()
+    db  = get_db()
+    es  = get_es()
     # pages stats
     crawled     = db.crawled_pages.count_documents({})
     try:
-        indexed  = es.count(index='web_pages')['count']
+        indexed  = es.count(index=INDEX_NAME)['count']
     except Exception:
         indexed = 0
     total_tasks = db.task_status.count_documents({})
@@ -179,6 +221,263 @@ def show_status():
     status_str = "active" if idx_alive else "inactive"
     print(f"Indexer node is {status_str}")
 
+# -------------------
+# Bulk reindex from MongoDB
+# -------------------
+REINDEX_CHECKPOINT_ID = INDEX_NAME
+
+# per bulk request: transport retries on timeouts and 502/503/504,
+# helper retries with exponential backoff on 429s
+BULK_REQUEST_TIMEOUT = 120
+BULK_MAX_RETRIES     = 5
+BULK_INITIAL_BACKOFF = 2
+BULK_MAX_BACKOFF     = 60
+
+class ReindexAborted(Exception):
+    """Elasticsearch became unreachable or kept rejecting requests mid-run."""
+
+class RateLimiter:
+    """
+    Space out bulk chunks across all sender threads so that at most
+    `rate` documents per second go to Elasticsearch (0 = unthrottled).
+    """
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self, count):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + count / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+def _doc_action(index, doc_id, source):
+    return {'_index': index, '_id': doc_id, '_source': source}
+
+def _bulk_index(actions, threads, chunk_size, limiter):
+    """
+    Push actions to Elasticsearch in rate-limited bulk requests on
+    `threads` threads. Returns (ok_count, rejected_items) where
+    rejected_items are real per-document rejections. Connection errors,
+    and 429s or chunk-level errors that survive the retries, raise
+    ReindexAborted so the caller doesn't advance its checkpoint.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from elasticsearch import ApiError, TransportError
+    from elasticsearch.helpers import streaming_bulk
+
+    es = get_es().options(request_timeout=BULK_REQUEST_TIMEOUT,
+                          retry_on_timeout=True,
+                          retry_on_status=(502, 503, 504),
+                          max_retries=BULK_MAX_RETRIES)
+
+    def send(chunk):
+        limiter.wait(len(chunk))
+        return list(streaming_bulk(es, chunk,
+                                   chunk_size=len(chunk),
+                                   max_retries=BULK_MAX_RETRIES,
+                                   initial_backoff=BULK_INITIAL_BACKOFF,
+                                   max_backoff=BULK_MAX_BACKOFF,
+                                   raise_on_error=False))
+
+    actions = list(actions)
+    chunks = [actions[i:i + chunk_size] for i in range(0, len(actions), chunk_size)]
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(send, chunks))
+    except (ApiError, TransportError) as exc:
+        raise ReindexAborted(str(exc)) from exc
+
+    ok_count = 0
+    rejected = []
+    for ok, info in itertools.chain.from_iterable(results):
+        if ok:
+            ok_count += 1
+            continue
+        item = next(iter(info.values()))
+        if item.get('status') == 429:
+            raise ReindexAborted(
+                f"still rejected with 429 after {BULK_MAX_RETRIES} retries")
+        rejected.append(item)
+    return ok_count, rejected
+
+def prepare_index(recreate):
+    """
+    Make sure the index exists with the shared analyzer settings and
+    return the index pages should be written to: the live alias, or with
+    recreate a fresh versioned index that replaces it once rebuilt.
+    """
+    from elasticsearch import ApiError, TransportError
+    try:
+        if recreate:
+            target = create_versioned_index(get_es())
+            print(f"[✔] Created index '{target}'; '{INDEX_NAME}' switches "
+                  f"to it when the rebuild finishes")
+            return target
+        ensure_index(get_es())
+    except (ApiError, TransportError) as exc:
+        raise ReindexAborted(str(exc)) from exc
+    return INDEX_NAME
+
+def reindex_pages(batch_size, threads, chunk_size, limiter, resume, target):
+    """
+    Stream crawled_pages ordered by _id and bulk index them into target.
+    Progress is checkpointed after every batch so an interrupted run can
+    continue with --resume, into the same target. Documents Elasticsearch
+    rejects are recorded in index_failures with their body so the replay
+    step picks them up. When target is a versioned index, the web_pages
+    alias is switched to it at the end.
+    """
+    from elasticsearch import ApiError, TransportError
+    db = get_db()
+    query = {}
+    done = 0
+    last_id = None
+    if resume:
+        ckpt = db.reindex_checkpoints.find_one({'_id': REINDEX_CHECKPOINT_ID})
+        if ckpt and ckpt.get('last_id') is not None:
+            last_id = ckpt['last_id']
+            query = {'_id': {'$gt': last_id}}
+            done = ckpt.get('indexed', 0)
+            target = ckpt.get('index', target)
+            print(f"[…] Resuming into '{target}' after {last_id} "
+                  f"({done} pages already indexed)")
+    else:
+        db.reindex_checkpoints.delete_one({'_id': REINDEX_CHECKPOINT_ID})
+
+    cursor = (db.crawled_pages
+              .find(query, {'url': 1, 'text': 1})
+              .sort('_id', 1)
+              .batch_size(batch_size))
+
+    started = time.time()
+    sent = 0
+    failures = 0
+    try:
+        while True:
+            batch = list(itertools.islice(cursor, batch_size))
+            if not batch:
+                break
+
+            actions = {}
+            for page in batch:
+                if not page.get('url'):
+                    continue
+                doc_id = hashlib.sha1(page['url'].encode('utf-8')).hexdigest()
+                actions[doc_id] = _doc_action(
+                    target, doc_id, {'url': page['url'], 'text': page.get('text', '')})
+
+            try:
+                ok_count, failed = _bulk_index(actions.values(), threads,
+                                               chunk_size, limiter)
+            except ReindexAborted as exc:
+                where = f"after {last_id}" if last_id is not None else "at the start"
+                raise ReindexAborted(
+                    f"{exc} (checkpoint: {done} pages indexed, {where})") from exc
+
+            if failed:
+                now = time.time()
+                db.index_failures.insert_many([{
+                    'doc_id': item.get('_id'),
+                    'body': actions[item.get('_id')]['_source'],
+                    'error': str(item.get('error') or item.get('exception')),
+                    'source': 'reindex',
+                    'timestamp': now
+                } for item in failed])
+            done += ok_count
+            failures += len(failed)
+            sent += len(batch)
+            last_id = batch[-1]['_id']
+
+            db.reindex_checkpoints.update_one(
+                {'_id': REINDEX_CHECKPOINT_ID},
+                {'$set': {
+                    'index': target,
+                    'last_id': last_id,
+                    'indexed': done,
+                    'updated_at': time.time()
+                }},
+                upsert=True
+            )
+            rate = sent / max(time.time() - started, 1e-6)
+            print(f"[…] {done} pages indexed, {failures} failed ({rate:.0f} docs/s)")
+    finally:
+        cursor.close()
+
+    if target != INDEX_NAME:
+        try:
+            switch_alias(get_es(), target)
+        except (ApiError, TransportError) as exc:
+            raise ReindexAborted(
+                f"{exc} (all pages indexed into '{target}'; "
+                f"--resume retries the alias switch)") from exc
+        print(f"[✔] '{INDEX_NAME}' now points to '{target}'")
+    print(f"[✔] Reindex complete: {done} pages indexed, {failures} failed")
+
+def replay_failures(batch_size, threads, chunk_size, limiter):
+    """
+    Re-send documents recorded in index_failures. Each doc_id is indexed
+    once, from its crawled_pages row when one exists (so a newer crawl wins)
+    and otherwise from the newest recorded body. Only entries up to the
+    replayed one are removed; entries without a body (e.g. GCS upload
+    errors) are left untouched.
+    """
+    from pymongo import DeleteMany
+    db = get_db()
+    cursor = db.index_failures.aggregate([
+        {'$match': {'body': {'$exists': True}}},
+        {'$sort': {'_id': 1}},
+        {'$group': {
+            '_id': '$doc_id',
+            'last_id': {'$last': '$_id'},
+            'body': {'$last': '$body'}
+        }},
+    ], allowDiskUse=True, batchSize=batch_size)
+
+    replayed = 0
+    failures = 0
+    try:
+        while True:
+            batch = list(itertools.islice(cursor, batch_size))
+            if not batch:
+                break
+
+            urls = [f['body'].get('url') for f in batch if f['body'].get('url')]
+            pages = {p['url']: p for p in db.crawled_pages.find(
+                {'url': {'$in': urls}}, {'url': 1, 'text': 1})}
+
+            latest = {}
+            actions = []
+            for f in batch:
+                source = f['body']
+                page = pages.get(source.get('url'))
+                if page:
+                    source = {'url': page['url'], 'text': page.get('text', '')}
+                latest[f['_id']] = f['last_id']
+                actions.append(_doc_action(INDEX_NAME, f['_id'], source))
+
+            _, failed = _bulk_index(actions, threads, chunk_size, limiter)
+            still_failing = {item.get('_id') for item in failed}
+            ops = [DeleteMany({
+                       'doc_id': doc_id,
+                       'body': {'$exists': True},
+                       '_id': {'$lte': last_id}
+                   }) for doc_id, last_id in latest.items()
+                   if doc_id not in still_failing]
+            if ops:
+                db.index_failures.bulk_write(ops, ordered=False)
+            replayed += len(ops)
+            failures += len(still_failing)
+    finally:
+        cursor.close()
+
+    print(f"[✔] Replayed {replayed} failed documents, {failures} still failing")
+
 # -------------------
 # Main CLI handler
 # -------------------
@@ -203,8 +502,29 @@ if __name__ == '__main__':
     # status & monitor
     subs.add_parser('status',  help='Show system status')
     subs.add_parser('monitor', help='Start monitors')
-    
+
+    # reindex
+    p3 = subs.add_parser('reindex', help='Rebuild the search index from MongoDB')
+    p3.add_argument('-b','--batch-size', type=int,   default=5000)
+    p3.add_argument('-t','--threads',    type=int,   default=4)
+    p3.add_argument('-c','--chunk-size', type=int,   default=500)
+    p3.add_argument('-r','--max-rate',   type=float, default=0,
+                    help='Max documents per second (0 = unthrottled)')
+    start = p3.add_mutually_exclusive_group()
+    start.add_argument('--resume', action='store_true',
+                       help='Continue from the last checkpoint')
+    start.add_argument('--recreate', action='store_true',
+                       help='Build a new index with the current analyzer '
+                            'settings and switch web_pages to it when done')
+    scope = p3.add_mutually_exclusive_group()
+    scope.add_argument('--failures-only', action='store_true',
+                       help='Only replay index_failures')
+    scope.add_argument('--skip-failures', action='store_true',
+                       help='Do not replay index_failures')
+
     args = parser.parse_args()
+    if args.cmd == 'reindex' and args.failures_only and (args.resume or args.recreate):
+        p3.error('--failures-only cannot be combined with --resume or --recreate')
 
     if args.cmd == 'crawl':
         enqueue_crawl(args.url, args.depth, args.politeness)
@@ -212,6 +532,21 @@ if __name__ == '__main__':
         do_search(args.keywords, args.mode, args.size)
     elif args.cmd == 'status':
         show_status()
+    elif args.cmd == 'reindex':
+        limiter = RateLimiter(args.max_rate)
+        try:
+            target = prepare_index(args.recreate)
+            if not args.failures_only:
+                reindex_pages(args.batch_size, args.threads, args.chunk_size,
+                              limiter, args.resume, target)
+            if not args.skip_failures:
+                replay_failures(args.batch_size, args.threads, args.chunk_size,
+                                limiter)
+        except ReindexAborted as exc:
+            print(f"[✘] Reindex aborted: {exc}")
+            print("    Re-run once it is back; pass --resume to continue the page "
+                  "reindex from the checkpoint.")
+            sys.exit(1)
     elif args.cmd == 'monitor':
         # start monitors in same process
         t1 = threading.Thread(target=heartbeat_monitor, daemon=True)
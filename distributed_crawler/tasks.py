@@ -2,16 +2,21 @@
 # tasks.py
 
 from celery import Celery
+import os
+import re
 import time
-import requests
-from bs4 import BeautifulSoup
-from pymongo import MongoClient
-from elasticsearch import Elasticsearch
+import codecs
 import hashlib
-import tldextract
+import tempfile
+import threading
+from html.parser import HTMLParser
 from urllib.parse import urlparse, urljoin, urlunparse
-from robotexclusionrulesparser import RobotExclusionRulesParser
-from google.cloud import storage
+
+from index_settings import INDEX_NAME, ensure_index
+
+# requests, charset_normalizer, tldextract, robotexclusionrulesparser, google.cloud.storage,
+# pymongo and elasticsearch are imported on first use so a fresh worker
+# only pays for Celery at startup.
 
 # -------------------
 # Celery setup
@@ -33,14 +38,46 @@ MONGO_URI = (
     "&w=majority&appName=Cluster0"
 )
 def get_mongo_client():
+    from pymongo import MongoClient
     return MongoClient(MONGO_URI, tls=True, tlsAllowInvalidCertificates=True)
 
 # -------------------
-# Elasticsearch setup
+# Lazily created clients
 # -------------------
-es = Elasticsearch([
-    {'host': '10.128.0.5', 'port': 9200, 'scheme': 'http'}
-])
+ES_HOSTS = [{'host': '10.128.0.5', 'port': 9200, 'scheme': 'http'}]
+
+_clients = {}
+_clients_lock = threading.Lock()
+_es_lock = threading.Lock()
+
+def get_es():
+    """
+    Return the Elasticsearch client, creating it on first use and making
+    sure the index exists with the shared analyzer settings before the
+    first write can auto-create it with a dynamic mapping. It has its own
+    lock so a slow ES doesn't stall domain checks behind _clients_lock.
+    """
+    with _es_lock:
+        if 'es' not in _clients:
+            from elasticsearch import Elasticsearch
+            es = Elasticsearch(ES_HOSTS)
+            ensure_index(es)
+            _clients['es'] = es
+        return _clients['es']
+
+def get_tld_extractor():
+    """
+    Return a tldextract extractor that uses the public suffix list snapshot
+    bundled with tldextract instead of fetching it over the network.
+    """
+    with _clients_lock:
+        if 'tld' not in _clients:
+            import tldextract
+            _clients['tld'] = tldextract.TLDExtract(suffix_list_urls=())
+        return _clients['tld']
+
+def registered_domain(url: str) -> str:
+    return get_tld_extractor()(url).registered_domain
 
 # -------------------
 # URL normalization helper
@@ -58,6 +95,185 @@ def normalize_url(url: str) -> str:
         parsed.fragment
     ))
 
+# -------------------
+# Streaming fetch limits (override via environment)
+# -------------------
+FETCH_MAX_BYTES       = int(os.environ.get('CRAWLER_FETCH_MAX_BYTES', 5 * 1024 * 1024))
+FETCH_CONNECT_TIMEOUT = float(os.environ.get('CRAWLER_FETCH_CONNECT_TIMEOUT', 5))
+FETCH_READ_TIMEOUT    = float(os.environ.get('CRAWLER_FETCH_READ_TIMEOUT', 10))
+FETCH_TOTAL_TIMEOUT   = float(os.environ.get('CRAWLER_FETCH_TOTAL_TIMEOUT', 30))
+FETCH_CHUNK_SIZE      = 64 * 1024
+HTML_CONTENT_TYPES    = {'text/html', 'application/xhtml+xml'}
+
+_CHARSET_RE      = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.I)
+
+# -------------------
+# Incremental HTML parser
+# -------------------
+class PageParser(HTMLParser):
+    """
+    Collect visible text and <a href> links from HTML fed chunk by chunk.
+    """
+    SKIP_TAGS = {'script', 'style', 'template'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.texts = []
+        self.links = []
+        self._skip = 0
+        self._pending = []
+
+    def _flush(self):
+        # a text run may arrive in several pieces when it spans chunks
+        if self._pending:
+            data = ''.join(self._pending).strip()
+            if data:
+                self.texts.append(data)
+            self._pending = []
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+        elif tag == 'a':
+            href = dict(attrs).get('href')
+            if href:
+                self.links.append(href)
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in self.SKIP_TAGS and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._pending.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(self.texts)
+
+def _detect_encoding(content_type: str, head: bytes) -> str:
+    """
+    Pick a codec from a UTF-8 BOM, the Content-Type header, a <meta charset>
+    in the first chunk, or charset_normalizer, in that order. Only the first
+    chunk is inspected, so a pure-ASCII guess is widened to UTF-8.
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    candidates = []
+    m = _CHARSET_RE.search(content_type)
+    if m:
+        candidates.append(m.group(1))
+    m = _META_CHARSET_RE.search(head[:4096])
+    if m:
+        candidates.append(m.group(1).decode('ascii', 'ignore'))
+    if not candidates:
+        from charset_normalizer import from_bytes
+        best = from_bytes(head).best()
+        if best:
+            candidates.append(best.encoding)
+    for name in candidates:
+        try:
+            name = codecs.lookup(name).name
+        except LookupError:
+            continue
+        return 'utf-8' if name == 'ascii' else name
+    return 'utf-8'
+
+def _charset_label(encoding: str) -> str:
+    """Turn a Python codec name into a Content-Type charset label."""
+    if encoding in ('utf-8', 'utf-8-sig'):
+        return 'utf-8'
+    return encoding.replace('_', '-')
+
+def _set_read_timeout(resp, seconds: float):
+    """Bound the next socket read of a streamed response."""
+    sock = getattr(getattr(resp.raw, 'connection', None), 'sock', None)
+    if sock is not None:
+        sock.settimeout(max(seconds, 0.01))
+
+def fetch_html(url: str):
+    """
+    Stream an HTML page, decoding and parsing it chunk by chunk.
+    Non-HTML responses are rejected from the headers, and bodies over
+    FETCH_MAX_BYTES or FETCH_TOTAL_TIMEOUT are abandoned. Every socket read
+    is capped by the time left, so a trickling server can't hold the worker
+    past the deadline.
+    Returns (parser, raw_file, charset, size) or None; raw_file holds the
+    raw body (size bytes, in `charset`) for the GCS upload and must be
+    closed by the caller. Only network errors are swallowed; anything else
+    is a bug and propagates.
+    """
+    import requests
+    import urllib3
+    network_errors = (requests.RequestException, urllib3.exceptions.HTTPError, OSError)
+    deadline = time.time() + FETCH_TOTAL_TIMEOUT
+    try:
+        resp = requests.get(url, stream=True, verify=False,
+                            timeout=(FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT))
+    except requests.RequestException:
+        return None
+
+    with resp:
+        try:
+            resp.raise_for_status()
+        except requests.RequestException:
+            return None
+
+        content_type = resp.headers.get('Content-Type', '')
+        mime = content_type.split(';', 1)[0].strip().lower()
+        if mime and mime not in HTML_CONTENT_TYPES:
+            return None
+        try:
+            if int(resp.headers.get('Content-Length', 0)) > FETCH_MAX_BYTES:
+                return None
+        except ValueError:
+            pass
+
+        parser = PageParser()
+        raw = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        encoding = 'utf-8'
+        decoder = None
+        received = 0
+        complete = False
+        try:
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                _set_read_timeout(resp, min(FETCH_READ_TIMEOUT, remaining))
+                # read1 returns after a single socket read instead of
+                # blocking until a full chunk has trickled in
+                chunk = resp.raw.read1(FETCH_CHUNK_SIZE, decode_content=True)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if received > FETCH_MAX_BYTES:
+                    return None
+                if decoder is None:
+                    encoding = _detect_encoding(content_type, chunk)
+                    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+                raw.write(chunk)
+                parser.feed(decoder.decode(chunk))
+            if decoder is not None:
+                parser.feed(decoder.decode(b'', final=True))
+            parser.close()
+            complete = True
+        except network_errors:
+            return None
+        finally:
+            if not complete:
+                raw.close()
+
+    raw.seek(0)
+    return parser, raw, _charset_label(encoding), received
+
 # -------------------
 # Fault-tolerant indexing task
 # -------------------
@@ -68,7 +284,7 @@ def index_document(self, doc_id: str, body: dict):
     Logs persistent failures to MongoDB.index_failures.
     """
     try:
-        es.index(index='web_pages', id=doc_id, body=body)
+        get_es().index(index=INDEX_NAME, id=doc_id, body=body)
     except Exception as exc:
         mongo = get_mongo_client()
         db = mongo['Crawler']
@@ -104,12 +320,13 @@ def process_url(u: str,
         return
 
     # Stay on seed domain
-    if tldextract.extract(u).registered_domain != seed_domain:
+    if registered_domain(u) != seed_domain:
         return
 
     # Robots.txt handling
     domain_key = f"{parsed.scheme}://{parsed.netloc}"
     if domain_key not in robots_cache:
+        from robotexclusionrulesparser import RobotExclusionRulesParser
         rerp = RobotExclusionRulesParser()
         try:
             rerp.fetch(f"{domain_key}/robots.txt")
@@ -129,52 +346,53 @@ def process_url(u: str,
     delay = rerp.get_crawl_delay("MyCrawlerBot") or politeness
     time.sleep(delay)
 
-    # Fetch page
-    try:
-        resp = requests.get(u, timeout=10, verify=False)
-        resp.raise_for_status()
-    except Exception:
+    # Fetch & parse page (streamed, HTML only, size-capped)
+    fetched = fetch_html(u)
+    if fetched is None:
         return
+    parser, raw, charset, size = fetched
+    try:
+        text = parser.text
 
-    # Extract text
-    soup = BeautifulSoup(resp.text, 'html.parser')
-    text = soup.get_text(separator='\n', strip=True)
-
-    # Persist to MongoDB
-    mongo = get_mongo_client()
-    db = mongo['Crawler']
-    db.crawled_pages.update_one(
-        {'url': u},
-        {'$set': {
-            'text': text,
-            'depth': current_depth,
-            'timestamp': time.time()
-        }},
-        upsert=True
-    )
+        # Persist to MongoDB
+        mongo = get_mongo_client()
+        db = mongo['Crawler']
+        db.crawled_pages.update_one(
+            {'url': u},
+            {'$set': {
+                'text': text,
+                'depth': current_depth,
+                'timestamp': time.time()
+            }},
+            upsert=True
+        )
 
-    # Generate doc_id and enqueue indexing
-    doc_id = hashlib.sha1(u.encode('utf-8')).hexdigest()
-    index_document.delay(doc_id, {'url': u, 'text': text})
+        # Generate doc_id and enqueue indexing
+        doc_id = hashlib.sha1(u.encode('utf-8')).hexdigest()
+        index_document.delay(doc_id, {'url': u, 'text': text})
 
-    # Upload raw HTML to GCS
-    try:
-        gcs = storage.Client()
-        bucket = gcs.bucket('distributed-crawler')
-        blob = bucket.blob(f"{doc_id}.html")
-        blob.upload_from_string(resp.text, content_type='text/html')
-    except Exception as exc:
-        db.index_failures.insert_one({
-            'doc_id': doc_id,
-            'error': f"GCS upload failed: {exc}",
-            'timestamp': time.time()
-        })
+        # Upload raw HTML to GCS
+        try:
+            from google.cloud import storage
+            gcs = storage.Client()
+            bucket = gcs.bucket('distributed-crawler')
+            blob = bucket.blob(f"{doc_id}.html")
+            blob.upload_from_file(raw, size=size,
+                                  content_type=f'text/html; charset={charset}')
+        except Exception as exc:
+            db.index_failures.insert_one({
+                'doc_id': doc_id,
+                'error': f"GCS upload failed: {exc}",
+                'timestamp': time.time()
+            })
+    finally:
+        raw.close()
 
     mongo.close()
 
     # Recurse on links
-    for link in soup.find_all('a', href=True):
-        href = link['href'].strip()
+    for href in parser.links:
+        href = href.strip()
         if not href or href.startswith('javascript:'):
             continue
         absolute = urljoin(u, href)
@@ -206,7 +424,7 @@ def crawl_url(self, seed_url: str, depth: int, politeness: float):
 
     visited = set()
     robots_cache = {}
-    seed_domain = tldextract.extract(seed_url).registered_domain
+    seed_domain = registered_domain(seed_url)
 
     # Begin recursive crawl
     process_url(seed_url, depth, seed_domain, politeness, visited, robots_cache)
@@ -0,0 +1,55 @@
+#!/usr/bin/env bash
+# File: distributed_crawler/tests/bench_startup.sh
+# Purpose: Import-time profile and CLI/worker startup timings.
+# Usage: cd Distributed-Web-Crawling/distributed_crawler/tests
+#        ./bench_startup.sh [runs]
+
+set -euo pipefail
+
+# ── Derive paths ───────────────────────────────────────────────────────────────
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+BASE_DIR="$(dirname "$SCRIPT_DIR")"            # .../distributed_crawler
+MASTER_NODE_PY="$BASE_DIR/master_node.py"      # path to master_node.py
+IMPORTTIME_LOG="$SCRIPT_DIR/importtime.log"
+# ── Config ────────────────────────────────────────────────────────────────────
+RUNS="${1:-5}"
+TOP=15
+# ───────────────────────────────────────────────────────────────────────────────
+
+# best wall-clock time (seconds) over $RUNS runs of the given command
+best_of() {
+  python3 - "$RUNS" "$@" <<'PYCODE'
+import subprocess, sys, time
+runs, cmd = int(sys.argv[1]), sys.argv[2:]
+best = float('inf')
+for _ in range(runs):
+    t0 = time.perf_counter()
+    rc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+    if rc != 0:
+        print(f"failed (exit {rc})")
+        sys.exit(0)
+    best = min(best, time.perf_counter() - t0)
+print(f"{best:.3f}s")
+PYCODE
+}
+
+cd "$BASE_DIR"
+
+echo "🔹 1) Import-time profile (top $TOP cumulative, microseconds)…"
+for MOD in tasks master_node indexer_api; do
+  echo "   • import $MOD"
+  python3 -X importtime -c "import $MOD" 2> "$IMPORTTIME_LOG" || true
+  grep '^import time:' "$IMPORTTIME_LOG" | grep -v 'self \[us\]' \
+    | sort -t'|' -k2 -n -r | head -n "$TOP" | sed 's/^/       /'
+done
+
+echo
+echo "🔹 2) Startup timings (best of $RUNS)…"
+echo "   • python3 -c pass            → $(best_of python3 -c pass)"
+echo "   • import tasks (worker)      → $(best_of python3 -c 'import tasks')"
+echo "   • import master_node         → $(best_of python3 -c 'import master_node')"
+echo "   • master_node.py --help      → $(best_of python3 "$MASTER_NODE_PY" --help)"
+# status/crawl up to their first network call: `status` then pings Celery
+# for 5s and connects to Atlas, which is end-to-end time, not startup
+echo "   • status, pre-network        → $(best_of python3 -c 'import master_node as m; m.get_app(); m.get_es(); import pymongo')"
+echo "   • crawl, pre-network         → $(best_of python3 -c 'import master_node; from tasks import crawl_url')"
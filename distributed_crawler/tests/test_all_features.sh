@@ -111,6 +111,50 @@ EOF
 )
 [ "$COUNT" -ge 1 ] && echo "    ✓ requeued ($COUNT copies)" || { echo "    ✗ not requeued"; exit 1; }
 
+echo
+echo "🔹 8) Testing reindex & index_failures replay…"
+$MONGO_CMD <<EOF
+use $DB
+db.index_failures.insertOne({
+  doc_id: "reindex-test",
+  body: { url: "http://reindex-test.invalid", text: "old body" },
+  error: "test",
+  timestamp: 0
+});
+db.index_failures.insertOne({
+  doc_id: "reindex-test",
+  body: { url: "http://reindex-test.invalid", text: "new body" },
+  error: "test",
+  timestamp: 1
+});
+EOF
+python3 "$MASTER_NODE_PY" reindex --failures-only
+COUNT=$($MONGO_CMD <<EOF
+use $DB
+db.index_failures.count({ doc_id: "reindex-test" })
+EOF
+)
+[ "$COUNT" -eq 0 ] && echo "    ✓ failures replayed" || { echo "    ✗ $COUNT failures left"; exit 1; }
+DOC=$(curl -s "http://$ES_IP:$ES_PORT/web_pages/_doc/reindex-test")
+echo "$DOC" | grep -q '"new body"' && echo "    ✓ newest body indexed" || { echo "    ✗ stale body: $DOC"; exit 1; }
+curl -s -o /dev/null -X DELETE "http://$ES_IP:$ES_PORT/web_pages/_doc/reindex-test"
+
+REINDEX=$(python3 "$MASTER_NODE_PY" reindex -b 500 --skip-failures)
+echo "$REINDEX" | tail -n 1
+echo "$REINDEX" | grep -q "Reindex complete" && echo "    ✓ reindex OK" || { echo "    ✗ reindex FAIL"; exit 1; }
+REBUILD=$(python3 "$MASTER_NODE_PY" reindex -b 500 --skip-failures --recreate -r 2000)
+echo "$REBUILD" | tail -n 1
+ALIAS=$(curl -s "http://$ES_IP:$ES_PORT/_alias/web_pages")
+echo "$ALIAS" | grep -q '"web_pages_[0-9]*"' && echo "    ✓ alias switched to rebuilt index" || { echo "    ✗ alias FAIL: $ALIAS"; exit 1; }
+RESUME=$(python3 "$MASTER_NODE_PY" reindex -b 500 --skip-failures --resume)
+echo "$RESUME" | grep -q "Resuming into" && echo "    ✓ resume from checkpoint OK" || { echo "    ✗ resume FAIL"; exit 1; }
+ANALYZER=$(curl -s "http://$ES_IP:$ES_PORT/web_pages/_settings")
+echo "$ANALYZER" | grep -q "porter_stem" && echo "    ✓ stemming analyzer in place" || { echo "    ✗ analyzer missing"; exit 1; }
+
+echo
+echo "🔹 9) Testing streaming fetcher (content-type, size cap, deadline)…"
+python3 -m pytest -q "$SCRIPT_DIR/test_fetch_html.py" && echo "    ✓ fetcher OK" || { echo "    ✗ fetcher FAIL"; exit 1; }
+
 echo
 echo "✅ ALL TESTS PASSED! 🎉"
 
@@ -0,0 +1,160 @@
+# File: distributed_crawler/tests/test_fetch_html.py
+# Purpose: Offline checks for the streaming fetcher and incremental parser.
+# Usage: cd Distributed-Web-Crawling/distributed_crawler/tests
+#        python3 -m pytest -q test_fetch_html.py
+
+import os
+import sys
+import time
+import codecs
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tasks  # noqa: E402
+
+PAGE = (
+    '<html><head><meta charset="utf-8"><title>Demo</title>'
+    '<style>p { color: red }</style>'
+    '<script>var s = "<a href=/not-a-link>";</script></head>'
+    '<body><h1>Café &amp; bar</h1>'
+    '<p>First <a href="/one">one</a></p>'
+    '<p><a href="https://example.com/two">two</a> tail</p>'
+    '<template>hidden</template></body></html>'
+).encode('utf-8')
+PAGE_TEXT = 'Demo\nCafé & bar\nFirst\none\ntwo\ntail'
+PAGE_LINKS = ['/one', 'https://example.com/two']
+
+# 100 KB of ASCII before the first non-ASCII character
+LATE_UTF8 = ('<p>' + 'a' * 100000 + '</p><p>naïve ✓</p>').encode('utf-8')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type, length=True):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        if length:
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        # chunked transfer in small pieces
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i in range(0, len(body), 13):
+            piece = body[i:i + 13]
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(piece), piece))
+        self.wfile.write(b'0\r\n\r\n')
+
+    def do_GET(self):
+        if self.path == '/page':
+            self._send(PAGE, 'text/html; charset=utf-8')
+        elif self.path == '/chunked':
+            self._send(PAGE, 'text/html', length=False)
+        elif self.path == '/late-utf8':
+            self._send(LATE_UTF8, 'text/html')
+        elif self.path == '/pdf':
+            self._send(b'%PDF-1.4' + b'x' * 1000, 'application/pdf')
+        elif self.path == '/big-declared':
+            self._send(b'<p>' + b'x' * 5000 + b'</p>', 'text/html')
+        elif self.path == '/big-streamed':
+            self._send(b'<p>' + b'x' * 5000 + b'</p>', 'text/html', length=False)
+        elif self.path == '/trickle':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', '1000')
+            self.end_headers()
+            try:
+                for _ in range(1000):
+                    self.wfile.write(b'x')
+                    self.wfile.flush()
+                    time.sleep(0.1)
+            except OSError:
+                pass
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # the fetcher hangs up early on rejected bodies; that's expected
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    srv = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{srv.server_port}'
+    srv.shutdown()
+
+
+def _fetch(url):
+    fetched = tasks.fetch_html(url)
+    if fetched is not None:
+        fetched[1].close()
+    return fetched
+
+
+@pytest.mark.parametrize('step', [1, 7, 64, len(PAGE)])
+def test_parser_same_result_for_any_chunking(step):
+    parser = tasks.PageParser()
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for i in range(0, len(PAGE), step):
+        parser.feed(decoder.decode(PAGE[i:i + step]))
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    assert parser.text == PAGE_TEXT
+    assert parser.links == PAGE_LINKS
+
+
+@pytest.mark.parametrize('path', ['/page', '/chunked'])
+def test_fetch_extracts_text_and_links(server, path):
+    parser, raw, charset, size = tasks.fetch_html(server + path)
+    try:
+        assert parser.text == PAGE_TEXT
+        assert parser.links == PAGE_LINKS
+        assert charset == 'utf-8'
+        assert size == len(PAGE)
+        assert raw.read() == PAGE
+    finally:
+        raw.close()
+
+
+def test_ascii_first_chunk_still_decodes_utf8(server):
+    parser, raw, charset, _ = tasks.fetch_html(server + '/late-utf8')
+    raw.close()
+    assert charset == 'utf-8'
+    assert parser.text.endswith('naïve ✓')
+
+
+def test_rejects_non_html_content_type(server):
+    assert _fetch(server + '/pdf') is None
+
+
+@pytest.mark.parametrize('path', ['/big-declared', '/big-streamed'])
+def test_rejects_oversized_body(server, monkeypatch, path):
+    monkeypatch.setattr(tasks, 'FETCH_MAX_BYTES', 1000)
+    assert _fetch(server + path) is None
+
+
+def test_total_timeout_bounds_wall_time(server, monkeypatch):
+    monkeypatch.setattr(tasks, 'FETCH_TOTAL_TIMEOUT', 1)
+    started = time.time()
+    assert _fetch(server + '/trickle') is None
+    assert time.time() - started < 2
+
+
+def test_parser_bugs_are_not_swallowed(server, monkeypatch):
+    def broken_feed(self, data):
+        raise ValueError('parser bug')
+    monkeypatch.setattr(tasks.PageParser, 'feed', broken_feed)
+    with pytest.raises(ValueError):
+        tasks.fetch_html(server + '/page')